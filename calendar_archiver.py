@@ -5,15 +5,54 @@ Works with online ICS URLs and specific month/year filtering
 """
 
 import os
+import re
 import sys
 import requests
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from icalendar import Calendar
 import hashlib
 import json
+import logging
+import functools
+import itertools
+import operator
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+log = logging.getLogger(__name__)
+
+try:
+    from icalendar.timezone import tzp as _ical_tzp  # icalendar >= 6
+except ImportError:
+    _ical_tzp = None
+
+try:
+    import orjson  # Optional: much faster metadata reads and writes
+except ImportError:
+    orjson = None
+
+def load_json_file(path):
+    """Load a JSON file, using orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_json_file(path, data):
+    """Write data as indented JSON, using orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
+
+# KEY=value assignments; comment lines never match since keys can't start with '#'
+_ENV_LINE = re.compile(r'^[ \t]*([A-Za-z_][A-Za-z_0-9]*)[ \t]*=[ \t]*(.*?)[ \t\r]*$', re.MULTILINE)
+
 def load_env_file():
     """Load environment variables from .env file"""
     env_vars = {}
@@ -21,26 +60,24 @@ def load_env_file():
     
     if os.path.exists(env_file):
         try:
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        env_vars[key.strip()] = value.strip()
+            with open(env_file, 'r', encoding='utf-8') as f:
+                data = f.read()
+            for key, value in _ENV_LINE.findall(data):
+                # Strip one level of matching quotes
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+                    value = value[1:-1]
+                env_vars[key] = value
             print(f"✓ Loaded configuration from {env_file}")
         except Exception as e:
             print(f"Warning: Could not load {env_file}: {e}")
     
     return env_vars
 
-def download_ics_file(url):
-    """Download ICS file from URL with robust session handling and progressive timeouts"""
-    print(f"Downloading ICS file from: {url}")
-    
-    # Create a session with retry strategy
+def _create_session():
+    """Create an HTTP session with retry strategy and connection pooling"""
     session = requests.Session()
     
-    # Configure retry strategy
+    # Configure retry strategy; covers rate limiting and server errors with backoff
     retry_strategy = Retry(
         total=3,
         status_forcelist=[429, 500, 502, 503, 504],
@@ -48,9 +85,46 @@ def download_ics_file(url):
         backoff_factor=1
     )
     
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=10)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
+    return session
+
+# Shared across downloads so repeated fetches reuse pooled TCP/TLS connections
+_SESSION = _create_session()
+
+# Local copies of downloaded calendars, revalidated with conditional GETs
+CACHE_DIR = '.cache'
+
+def _cache_paths(url):
+    """Return the cached body and metadata paths for a calendar URL"""
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.ics"), os.path.join(CACHE_DIR, f"{key}.meta.json")
+
+def _load_cache_meta(cache_file, meta_file):
+    """Load validators for a cached calendar, or an empty dict if unusable"""
+    if not (os.path.exists(cache_file) and os.path.exists(meta_file)):
+        return {}
+    try:
+        return load_json_file(meta_file)
+    except Exception as e:
+        print(f"  Warning: Could not load cache metadata: {e}")
+        return {}
+
+def _read_cached_lines(cache_file):
+    """Yield the lines of a cached calendar without line endings"""
+    with open(cache_file, 'r', encoding='utf-8', newline='') as f:
+        for line in f:
+            yield line.rstrip('\r\n')
+
+def download_ics_file(url, session=_SESSION):
+    """Download ICS file from URL with robust session handling and progressive timeouts.
+
+    Returns an iterator over the decoded lines of the calendar, streamed from
+    the response as they arrive or read from the local cache when the server
+    reports the calendar unchanged.
+    """
+    print(f"Downloading ICS file from: {url}")
     
     # Set headers that work well with Outlook/Office365
     headers = {
@@ -63,34 +137,24 @@ def download_ics_file(url):
         'Pragma': 'no-cache'
     }
     
+    # Revalidate a previous download instead of fetching it again
+    cache_file, meta_file = _cache_paths(url)
+    cache_meta = _load_cache_meta(cache_file, meta_file)
+    if cache_meta.get('etag'):
+        headers['If-None-Match'] = cache_meta['etag']
+    if cache_meta.get('last_modified'):
+        headers['If-Modified-Since'] = cache_meta['last_modified']
+    
     # Try with increasing timeouts
     timeouts = [30, 60, 120]  # 30s, 60s, 120s
+    response = None
     
     for timeout in timeouts:
         try:
             print(f"Trying with {timeout} second timeout...")
             response = session.get(url, headers=headers, timeout=timeout, stream=True)
             response.raise_for_status()
-            
-            # Download content in chunks to handle large files better
-            content = b''
-            content_length = response.headers.get('content-length')
-            if content_length:
-                print(f"Expected file size: {int(content_length)} bytes")
-            
-            chunk_size = 8192  # 8KB chunks
-            downloaded = 0
-            
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    content += chunk
-                    downloaded += len(chunk)
-                    if content_length and downloaded % (chunk_size * 100) == 0:  # Progress every ~800KB
-                        progress = (downloaded / int(content_length)) * 100
-                        print(f"  Downloaded {downloaded} bytes ({progress:.1f}%)")
-            
-            print(f"✓ Downloaded {len(content)} bytes successfully")
-            return content
+            break
             
         except requests.exceptions.Timeout:
             print(f"✗ Timeout with {timeout} seconds")
@@ -104,53 +168,239 @@ def download_ics_file(url):
             print(f"✗ Error downloading ICS file: {e}")
             if timeout == timeouts[-1]:
                 print("✗ All download attempts failed")
+        
+        # Streamed responses hold their connection until closed; hand it back to the pool
+        if response is not None:
+            response.close()
+            response = None
     
-    # Final fallback with no timeout and simplified headers
-    try:
-        print("Final attempt with no timeout and basic headers...")
-        simple_headers = {'User-Agent': 'Calendar-Archiver/1.0'}
-        response = session.get(url, headers=simple_headers)
-        response.raise_for_status()
-        print(f"✓ Downloaded {len(response.content)} bytes")
-        return response.content
-    except requests.RequestException as e:
-        print(f"✗ Final download attempt failed: {e}")
+    if response is None:
         sys.exit(1)
-    finally:
-        session.close()
+    
+    if response.status_code == 304:
+        response.close()
+        print(f"✓ Calendar unchanged, using cached copy: {cache_file}")
+        return _read_cached_lines(cache_file)
+    
+    content_length = response.headers.get('content-length')
+    if content_length:
+        print(f"Expected file size: {int(content_length)} bytes")
+    
+    return _iter_response_lines(response, url, cache_file, meta_file, content_length)
 
-def parse_ics_data(ics_data):
-    """Parse ICS data and return list of events"""
-    print("Parsing calendar events...")
-    events = []
+# Report download progress roughly every 800KB
+PROGRESS_INTERVAL = 8192 * 100
+
+def _iter_response_lines(response, url, cache_file, meta_file, content_length=None):
+    """Yield decoded response lines, saving a revalidatable copy on the way"""
+    # Only keep a copy if the server gives us something to revalidate against
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    cache_tmp = cache_file + '.tmp'
+    cache_out = None
+    if etag or last_modified:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            cache_out = open(cache_tmp, 'w', encoding='utf-8', newline='')
+        except OSError as e:
+            print(f"  Warning: Could not write download cache: {e}")
     
+    line_count = 0
+    downloaded = 0
+    next_report = PROGRESS_INTERVAL
+    completed = False
     try:
-        cal = Calendar.from_ical(ics_data)
-    except Exception as e:
-        print(f"✗ Error parsing ICS data: {e}")
-        sys.exit(1)
+        # Split as bytes: str.splitlines() would also break on characters such
+        # as U+2028 or form feed inside property values. ICS is UTF-8 by spec.
+        for raw_line in response.iter_lines(chunk_size=1 << 16):
+            line = raw_line.decode('utf-8', errors='replace')
+            if line_count == 0:
+                line = line.lstrip('\ufeff')
+            line_count += 1
+            
+            # Line endings are stripped; ICS lines end in CRLF
+            downloaded += len(raw_line) + 2
+            if downloaded >= next_report:
+                next_report += PROGRESS_INTERVAL
+                if content_length:
+                    progress = (downloaded / int(content_length)) * 100
+                    print(f"  Downloaded {downloaded} bytes ({progress:.1f}%)")
+                else:
+                    print(f"  Downloaded {downloaded} bytes")
+            if cache_out is not None:
+                cache_out.write(line + '\n')
+            yield line
+        completed = True
+    finally:
+        response.close()
+        if cache_out is not None:
+            cache_out.close()
+            try:
+                if completed:
+                    os.replace(cache_tmp, cache_file)
+                    save_json_file(meta_file, {'url': url, 'etag': etag, 'last_modified': last_modified})
+                else:
+                    os.remove(cache_tmp)
+            except OSError as e:
+                print(f"  Warning: Could not update download cache: {e}")
+    
+    print(f"✓ Downloaded {downloaded} bytes ({line_count} lines) successfully")
+
+# Name and parameters of a content line: everything before the first unquoted ':'
+_PROPERTY_HEAD = re.compile(r'(?:[^":]|"[^"]*")*')
+_TZID_PARAM = re.compile(r';TZID=(?:"([^"]*)"|([^;:]*))', re.IGNORECASE)
+
+def _tzid_resolvable(tzid):
+    """Check whether icalendar can resolve a TZID without a VTIMEZONE"""
+    if _ical_tzp is not None:
+        try:
+            return _ical_tzp.timezone(tzid) is not None
+        except Exception:
+            return False
+    try:
+        import pytz  # icalendar < 6 resolves TZIDs through pytz
+    except ImportError:
+        return False
+    return tzid in pytz.all_timezones_set
+
+def _first_unknown_tzid(lines, known_tzids):
+    """Return the first TZID parameter in an event's lines that can't be resolved yet.
+
+    TZIDs icalendar resolves on its own are added to known_tzids so they are
+    only looked up once.
+    """
+    # Unfold continuation lines so parameters split across lines are seen whole
+    unfolded = []
+    for line in lines:
+        if line[0] in ' \t' and unfolded:
+            unfolded[-1] += line[1:]
+        else:
+            unfolded.append(line)
+    
+    for line in unfolded:
+        # Only parameters count; ';TZID=' inside a value such as DESCRIPTION doesn't
+        for quoted, bare in _TZID_PARAM.findall(_PROPERTY_HEAD.match(line).group()):
+            tzid = quoted or bare
+            if tzid not in known_tzids:
+                if not _tzid_resolvable(tzid):
+                    return tzid
+                known_tzids.add(tzid)
+    return None
+
+def iter_vevent_blocks(ics_lines):
+    """Split a stream of ICS lines into standalone single-event calendars.
+
+    Everything before the first VEVENT (VCALENDAR properties and VTIMEZONE
+    definitions) is parsed once up front so custom timezones are registered
+    with icalendar; each VEVENT is then wrapped in a minimal VCALENDAR.
+    RFC 5545 also allows VTIMEZONE after the events: those are registered as
+    soon as they are complete, and once an event refers to a TZID that is not
+    defined yet, the remaining events are held back until the whole calendar
+    has been read.
+    """
+    preamble = []
+    buf = None
+    header = None
+    known_tzids = set()
+    late_timezone = None
+    late_tzid = None
+    deferred = None
+    
+    for line in ics_lines:
+        if not line:
+            continue
+        
+        if buf is not None:
+            buf.append(line)
+            if line.startswith('END:VEVENT'):
+                if deferred is None:
+                    unknown_tzid = _first_unknown_tzid(buf, known_tzids)
+                    if unknown_tzid is not None:
+                        print(f"  Note: timezone '{unknown_tzid}' is not defined yet, buffering remaining events")
+                        deferred = []
+                block = '\r\n'.join(buf)
+                buf = None
+                if deferred is None:
+                    yield block
+                else:
+                    deferred.append(block)
+            continue
+        
+        if late_timezone is not None:
+            late_timezone.append(line)
+            # TZID as a property (not a parameter) only occurs inside VTIMEZONE
+            if line.startswith('TZID:'):
+                late_tzid = line[len('TZID:'):]
+            elif line.startswith('END:VTIMEZONE'):
+                # Register before marking it known, so later events resolve it
+                Calendar.from_ical('\r\n'.join(['BEGIN:VCALENDAR', 'VERSION:2.0'] + late_timezone + ['END:VCALENDAR']))
+                if late_tzid is not None:
+                    known_tzids.add(late_tzid)
+                late_timezone = None
+                late_tzid = None
+        elif line.startswith('BEGIN:VEVENT'):
+            if header is None:
+                Calendar.from_ical('\r\n'.join(preamble + ['END:VCALENDAR']))
+                header = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+                preamble = None
+            buf = header + [line]
+        elif header is None:
+            if line.startswith('TZID:'):
+                known_tzids.add(line[len('TZID:'):])
+            preamble.append(line)
+        elif line.startswith('BEGIN:VTIMEZONE'):
+            late_timezone = [line]
+    
+    if buf is not None:
+        raise ValueError("Unterminated VEVENT at end of calendar data")
+    
+    if deferred:
+        yield from deferred
+
+def parse_ics_data(ics_lines):
+    """Parse ICS lines and yield events one at a time"""
+    print("Parsing calendar events...")
     
     event_count = 0
-    for component in cal.walk():
-        if component.name == "VEVENT":
+    parsed_count = 0
+    try:
+        for block in iter_vevent_blocks(ics_lines):
             event_count += 1
             if event_count % 100 == 0:
                 print(f"  Parsed {event_count} events so far...")
             
             try:
+                component = Calendar.from_ical(block + '\r\nEND:VCALENDAR').walk('VEVENT')[0]
+                
                 # Extract event data
                 title = str(component.get('summary', 'Untitled'))
                 start_dt = component.get('dtstart').dt
-                end_dt = component.get('dtend').dt if component.get('dtend') else start_dt
+                dtend = component.get('dtend')
+                end_dt = dtend.dt if dtend is not None else start_dt
                 uid = str(component.get('uid', f'event_{event_count}'))
                 
+                # Timed events carry a datetime, all-day events a plain date
+                is_dt = hasattr(start_dt, 'time')
+                
                 # Calculate duration
-                if hasattr(start_dt, 'time'):
+                if is_dt:
                     duration = end_dt - start_dt
                     duration_str = str(duration)
                 else:
                     duration_str = "All day"
                 
+                # Day the event is filed under
+                event_date = start_dt.date() if is_dt else start_dt
+                
+                # Sort key as epoch seconds; aware times compare in UTC, naive
+                # times and all-day dates by their wall-clock value
+                if not is_dt:
+                    sort_ts = datetime.combine(start_dt, datetime.min.time(), tzinfo=timezone.utc).timestamp()
+                elif start_dt.tzinfo is not None:
+                    sort_ts = start_dt.timestamp()
+                else:
+                    sort_ts = start_dt.replace(tzinfo=timezone.utc).timestamp()
+                
                 location = str(component.get('location', ''))
                 description = str(component.get('description', ''))
                 
@@ -158,7 +408,8 @@ def parse_ics_data(ics_data):
                 attendees = component.get('attendee', [])
                 if not isinstance(attendees, list):
                     attendees = [attendees]
-                participants = [str(att).replace('MAILTO:', '') for att in attendees]
+                # Attendees are URIs; drop the scheme prefix in either case
+                participants = [att[7:] if att[:7].lower() == 'mailto:' else att for att in map(str, attendees)]
                 
                 # Get timestamps
                 created = str(component.get('created', ''))
@@ -174,54 +425,196 @@ def parse_ics_data(ics_data):
                     'description': description,
                     'participants': participants,
                     'created': created,
-                    'last_modified': last_modified
+                    'last_modified': last_modified,
+                    '_date': event_date,
+                    '_ym': (event_date.year, event_date.month),
+                    '_sort_ts': int(sort_ts)
                 }
                 
-                events.append(event)
-                
             except Exception as e:
                 print(f"  Warning: Skipping malformed event: {e}")
                 continue
+            
+            parsed_count += 1
+            yield event
+    except requests.RequestException as e:
+        # The body is streamed while parsing, so a dropped download surfaces here
+        print(f"✗ Download failed while reading ICS data: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error parsing ICS data: {e}")
+        sys.exit(1)
     
-    print(f"✓ Parsed {len(events)} total events")
-    return events
+    print(f"✓ Parsed {parsed_count} total events")
 
-def filter_events_by_month(events, target_year, target_month):
-    """Filter events to only include those from the specified month/year"""
+def select_target_month(events, target_year, target_month):
+    """Return events for the specified month/year, sorted by day and then start time"""
     print(f"Filtering events for {target_year}-{target_month:02d}...")
-    filtered_events = []
+    target_ym = (target_year, target_month)
+    month_events = [event for event in events if event['_ym'] == target_ym]
     
-    for event in events:
-        event_date = event['start']
-        if hasattr(event_date, 'date'):
-            event_date = event_date.date()
-        
-        if event_date.year == target_year and event_date.month == target_month:
-            filtered_events.append(event)
+    # Sorted so each day is a contiguous run for itertools.groupby
+    month_events.sort(key=operator.itemgetter('_date', '_sort_ts'))
     
-    print(f"✓ Found {len(filtered_events)} events for {target_year}-{target_month:02d}")
-    return filtered_events
+    print(f"✓ Found {len(month_events)} events for {target_year}-{target_month:02d}")
+    return month_events
 
 def get_event_hash(event):
-    """Create a hash of the event for comparison"""
-    event_data = f"{event['title']}|{event['start']}|{event['end']}|{event['location']}|{event['description']}"
-    return hashlib.md5(event_data.encode('utf-8')).hexdigest()
+    """Create a hash of the event for comparison, computed once per event.
+
+    Covers every field the day file renders (duration derives from start and
+    end), since an unchanged hash is what lets a day file be left as is.
+    """
+    event_hash = event.get('_hash')
+    if event_hash is None:
+        event_data = '\0'.join((event['uid'], event['title'], str(event['start']), str(event['end']),
+                                 event['location'], '\x1f'.join(event['participants']), event['description']))
+        # Only used for change detection, so speed matters more than collision resistance
+        event_hash = hashlib.blake2b(event_data.encode('utf-8'), digest_size=16).hexdigest()
+        event['_hash'] = event_hash
+    return event_hash
+
+def _day_folder(event_date):
+    """Return the year/month/day folder for a date, relative to the current directory"""
+    return os.path.join(str(event_date.year), f"{event_date.month:02d}", f"{event_date.day:02d}")
+
+@functools.lru_cache(maxsize=None)
+def _ensure_dir(path):
+    """Create a directory once per run, skipping the stat calls on repeat requests"""
+    os.makedirs(path, exist_ok=True)
+
+# Markdown layout of a day file; the optional per-event lines have their own templates
+_DAY_HEADER_TMPL = (
+    "# Calendar Events - {date:%Y-%m-%d}\n\n"
+    "**Date:** {date:%A, %B %d, %Y}\n"
+    "**Total Events:** {count}\n\n"
+    "---\n\n"
+)
+_EVENT_HEADER_TMPL = (
+    "## {i}. {title}\n\n"
+    "**Time:** {time}  \n"
+    "**Duration:** {duration}  \n"
+)
+_LOCATION_TMPL = "**Location:** {}  \n"
+_PARTICIPANTS_TMPL = "**Participants:** {}  \n"
+_DESCRIPTION_TMPL = "**Description:** {}  \n"
+_EVENT_FOOTER_TMPL = "**Event ID:** `{}`\n\n---\n\n"
+
+def _write_file(path, text):
+    """Write text as UTF-8 with raw os.write calls, skipping the buffered text I/O layers"""
+    data = memoryview(text.encode('utf-8'))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        # os.write may write less than asked for, so loop until everything is out
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+def _write_day(event_date, date_events, existing_hashes, skip_unchanged=False):
+    """Render and write the markdown file for one day.
+
+    With skip_unchanged, an existing file whose events all match their stored
+    hashes is left untouched. Returns (new_count, updated_count, log_records),
+    where each record is a (level, msg, args) tuple for the logger; output is
+    collected rather than emitted so days written in parallel still report in
+    order.
+    """
+    year = event_date.year
+    month = event_date.month
+    day = event_date.day
+    new_count = 0
+    updated_count = 0
+    log_records = [(logging.INFO, "  Processing %d-%02d-%02d (%d events)", (year, month, day, len(date_events)))]
+    # Checked once so per-event debug records cost nothing when disabled
+    debug = log.isEnabledFor(logging.DEBUG)
+    
+    # Folder structure is created up front by save_daily_events
+    folder_path = _day_folder(event_date)
+    
+    # Save events to markdown file
+    file_path = os.path.join(folder_path, f"{year}-{month:02d}-{day:02d}_events.md")
+    
+    # The file is regenerated completely, so only report that it exists
+    if os.path.exists(file_path):
+        if skip_unchanged and all(existing_hashes.get(event['uid']) == get_event_hash(event) for event in date_events):
+            if debug:
+                log_records.extend((logging.DEBUG, "    Unchanged: %s", (event['title'],)) for event in date_events)
+            log_records.append((logging.INFO, "    All events unchanged, keeping: %s", (file_path,)))
+            return new_count, updated_count, log_records
+        log_records.append((logging.INFO, "    Found existing file, will update...", ()))
+    
+    # Generate markdown content
+    parts = [_DAY_HEADER_TMPL.format(date=event_date, count=len(date_events))]
+    
+    for i, event in enumerate(date_events, 1):
+        event_hash = get_event_hash(event)
+        
+        # Check if this is an update
+        if event['uid'] in existing_hashes:
+            if existing_hashes.get(event['uid']) != event_hash:
+                log_records.append((logging.INFO, "    Updated: %s", (event['title'],)))
+                updated_count += 1
+            elif debug:
+                log_records.append((logging.DEBUG, "    Unchanged: %s", (event['title'],)))
+        else:
+            log_records.append((logging.INFO, "    New: %s", (event['title'],)))
+            new_count += 1
+        
+        # Format start and end times
+        start_time = event['start']
+        end_time = event['end']
+        
+        if hasattr(start_time, 'strftime'):
+            start_str = start_time.strftime('%H:%M')
+            if hasattr(end_time, 'strftime'):
+                end_str = end_time.strftime('%H:%M')
+                time_str = f"{start_str} - {end_str}"
+            else:
+                time_str = start_str
+        else:
+            time_str = "All day"
+        
+        parts.append(_EVENT_HEADER_TMPL.format(i=i, title=event['title'], time=time_str, duration=event['duration']))
+        
+        if event['location']:
+            parts.append(_LOCATION_TMPL.format(event['location']))
+        
+        if event['participants']:
+            participants_clean = [p for p in event['participants'] if p.strip()]
+            if participants_clean:
+                parts.append(_PARTICIPANTS_TMPL.format(', '.join(participants_clean)))
+        
+        if event['description']:
+            # Clean up description
+            desc = event['description'].replace('\n', ' ').replace('\r', ' ')
+            # Limit description length but show more than before
+            if len(desc) > 300:
+                desc = desc[:300] + "..."
+            parts.append(_DESCRIPTION_TMPL.format(desc))
+        
+        parts.append(_EVENT_FOOTER_TMPL.format(event['uid']))
+    
+    # Write markdown file
+    _write_file(file_path, ''.join(parts))
+    
+    log_records.append((logging.INFO, "    Saved to: %s", (file_path,)))
+    return new_count, updated_count, log_records
 
 def save_daily_events(events, target_year, target_month):
-    """Save events organized by year/month/day folders"""
+    """Save events, already sorted by day and start time, organized by year/month/day folders"""
     print(f"Saving events to ./{target_year}/{target_month:02d}/...")
     
     # Create metadata directory in the year folder
     metadata_dir = os.path.join(str(target_year), '.metadata')
-    os.makedirs(metadata_dir, exist_ok=True)
+    _ensure_dir(metadata_dir)
     
     # Load existing event hashes for this month
     metadata_file = os.path.join(metadata_dir, f"{target_year}_{target_month:02d}_events.json")
     existing_hashes = {}
     if os.path.exists(metadata_file):
         try:
-            with open(metadata_file, 'r') as f:
-                existing_hashes = json.load(f)
+            existing_hashes = load_json_file(metadata_file)
             print(f"✓ Loaded {len(existing_hashes)} existing event hashes")
         except Exception as e:
             print(f"  Warning: Could not load existing metadata: {e}")
@@ -229,129 +622,32 @@ def save_daily_events(events, target_year, target_month):
     updated_count = 0
     new_count = 0
     
-    # Group events by date
-    events_by_date = {}
-    for event in events:
-        event_date = event['start']
-        if hasattr(event_date, 'date'):
-            date_key = event_date.date()
-        else:
-            date_key = event_date
-            
-        if date_key not in events_by_date:
-            events_by_date[date_key] = []
-        events_by_date[date_key].append(event)
-    
-    # Process each day
-    for event_date, date_events in events_by_date.items():
-        year = event_date.year
-        month = event_date.month
-        day = event_date.day
-        
-        print(f"  Processing {year}-{month:02d}-{day:02d} ({len(date_events)} events)")
-        
-        # Create folder structure directly from current directory
-        folder_path = os.path.join(str(year), f"{month:02d}", f"{day:02d}")
-        os.makedirs(folder_path, exist_ok=True)
-        
-        # Save events to markdown file
-        file_path = os.path.join(folder_path, f"{year}-{month:02d}-{day:02d}_events.md")
-        
-        # Read existing file content if it exists
-        existing_events = {}
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                # Simple check if file exists (we'll regenerate it completely for simplicity)
-                print(f"    Found existing file, will update...")
-            except Exception as e:
-                print(f"    Warning: Could not read existing file: {e}")
-        
-        # Sort events by start time (handle both datetime and date objects, timezone-aware and naive)
-        def get_sort_key(event):
-            start = event['start']
-            if hasattr(start, 'time'):
-                # datetime object - normalize timezone info for comparison
-                if start.tzinfo is not None:
-                    # Convert to UTC for consistent comparison
-                    return start.utctimetuple()
-                else:
-                    # Naive datetime
-                    return start.timetuple()
-            else:
-                # date object
-                return datetime.combine(start, datetime.min.time()).timetuple()
-        
-        sorted_events = sorted(date_events, key=get_sort_key)
-        
-        # Generate markdown content
-        markdown_content = f"# Calendar Events - {year}-{month:02d}-{day:02d}\n\n"
-        markdown_content += f"**Date:** {event_date.strftime('%A, %B %d, %Y')}\n"
-        markdown_content += f"**Total Events:** {len(sorted_events)}\n\n"
-        markdown_content += "---\n\n"
-        
-        for i, event in enumerate(sorted_events, 1):
-            event_hash = get_event_hash(event)
-            
-            # Check if this is an update
-            if event['uid'] in existing_hashes:
-                if existing_hashes.get(event['uid']) != event_hash:
-                    print(f"    Updated: {event['title']}")
-                    updated_count += 1
-                else:
-                    print(f"    Unchanged: {event['title']}")
-            else:
-                print(f"    New: {event['title']}")
-                new_count += 1
-            
-            # Format start and end times
-            start_time = event['start']
-            end_time = event['end']
-            
-            if hasattr(start_time, 'strftime'):
-                start_str = start_time.strftime('%H:%M')
-                if hasattr(end_time, 'strftime'):
-                    end_str = end_time.strftime('%H:%M')
-                    time_str = f"{start_str} - {end_str}"
-                else:
-                    time_str = start_str
-            else:
-                time_str = "All day"
-            
-            markdown_content += f"## {i}. {event['title']}\n\n"
-            markdown_content += f"**Time:** {time_str}  \n"
-            markdown_content += f"**Duration:** {event['duration']}  \n"
-            
-            if event['location']:
-                markdown_content += f"**Location:** {event['location']}  \n"
-            
-            if event['participants']:
-                participants_clean = [p for p in event['participants'] if p.strip()]
-                if participants_clean:
-                    markdown_content += f"**Participants:** {', '.join(participants_clean)}  \n"
-            
-            if event['description']:
-                # Clean up description
-                desc = event['description'].replace('\n', ' ').replace('\r', ' ')
-                # Limit description length but show more than before
-                if len(desc) > 300:
-                    desc = desc[:300] + "..."
-                markdown_content += f"**Description:** {desc}  \n"
-            
-            markdown_content += f"**Event ID:** `{event['uid']}`\n\n"
-            markdown_content += "---\n\n"
-        
-        # Write markdown file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+    # A changed or removed event may still be listed in another day's file, so
+    # unchanged days can only be skipped when every known event is unchanged
+    current_hashes = {event['uid']: get_event_hash(event) for event in events}
+    skip_unchanged = all(current_hashes.get(uid) == event_hash for uid, event_hash in existing_hashes.items())
+    
+    # Create every day folder once before writing
+    for folder_path in sorted({_day_folder(event['_date']) for event in events}):
+        _ensure_dir(folder_path)
+    
+    # Days are independent files, so write them in parallel; file I/O releases the GIL
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_write_day, event_date, list(date_events), existing_hashes, skip_unchanged)
+                   for event_date, date_events in itertools.groupby(events, key=operator.itemgetter('_date'))]
         
-        print(f"    Saved to: {file_path}")
+        # Collect in submission order to keep the output deterministic
+        for future in futures:
+            day_new, day_updated, log_records = future.result()
+            new_count += day_new
+            updated_count += day_updated
+            for level, msg, args in log_records:
+                log.log(level, msg, *args)
     
     # Save metadata with current event hashes
     try:
-        with open(metadata_file, 'w') as f:
-            json.dump({event['uid']: get_event_hash(event) for event in events}, f, indent=2)
+        save_json_file(metadata_file, current_hashes)
         print(f"  Updated metadata file: {metadata_file}")
     except Exception as e:
         print(f"  Warning: Could not save metadata: {e}")
@@ -364,31 +660,39 @@ def archive_month(ics_url, target_year, target_month, all_events=None):
     
     # Download and parse ICS if not already provided
     if all_events is None:
-        ics_data = download_ics_file(ics_url)
-        all_events = parse_ics_data(ics_data)
+        all_events = parse_ics_data(download_ics_file(ics_url))
     
     # Filter for target month
-    filtered_events = filter_events_by_month(all_events, target_year, target_month)
+    month_events = select_target_month(all_events, target_year, target_month)
     
-    if not filtered_events:
+    if not month_events:
         print(f"No events found for {target_year}-{target_month:02d}")
         return 0
     
     # Save events directly to year/month structure
-    save_daily_events(filtered_events, target_year, target_month)
+    save_daily_events(month_events, target_year, target_month)
     
-    print(f"✓ Processed {len(filtered_events)} events for {target_year}-{target_month:02d}")
-    return len(filtered_events)
+    print(f"✓ Processed {len(month_events)} events for {target_year}-{target_month:02d}")
+    return len(month_events)
 
 def get_all_event_months(events):
     """Get all unique year/month combinations from events"""
-    months = set()
-    for event in events:
-        event_date = event['start']
-        if hasattr(event_date, 'date'):
-            event_date = event_date.date()
-        months.add((event_date.year, event_date.month))
-    return sorted(months)
+    return sorted({event['_ym'] for event in events})
+
+def configure_logging(env_vars, verbose=False):
+    """Send log output to stdout; -v or LOG_LEVEL (in .env or the environment) sets the level"""
+    if verbose:
+        level = logging.DEBUG
+    else:
+        level_name = env_vars.get('LOG_LEVEL') or os.environ.get('LOG_LEVEL') or 'INFO'
+        level = logging.getLevelName(level_name.upper())
+        if not isinstance(level, int):
+            print(f"Warning: Unknown LOG_LEVEL {level_name!r}, using INFO")
+            level = logging.INFO
+    # Only this module's logger follows the requested level, so -v doesn't
+    # also turn on debug output from urllib3 and other libraries
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+    log.setLevel(level)
 
 def main():
     # Load environment variables
@@ -397,8 +701,13 @@ def main():
     print(f"=== Calendar Archiver Started ===")
     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    # Pull the verbosity flag out before counting positional arguments
+    verbose = any(arg in ('-v', '--verbose') for arg in sys.argv[1:])
+    args = [arg for arg in sys.argv[1:] if arg not in ('-v', '--verbose')]
+    configure_logging(env_vars, verbose)
+    
     # Parse command line arguments
-    if len(sys.argv) == 1:
+    if len(args) == 0:
         # No arguments - use .env file and archive all months
         ics_url = env_vars.get('ICS_URL')
         if not ics_url:
@@ -426,9 +735,8 @@ def main():
         else:
             print(f"Target: All months in {target_year}")
         
-        # Download and parse ICS once
-        ics_data = download_ics_file(ics_url)
-        all_events = parse_ics_data(ics_data)
+        # Download and parse ICS once; kept as a list since it is reused per month
+        all_events = list(parse_ics_data(download_ics_file(ics_url)))
         
         if target_month:
             # Archive specific month
@@ -449,7 +757,7 @@ def main():
                 events_count = archive_month(ics_url, year, month, all_events)
                 total_events += events_count
         
-    elif len(sys.argv) == 3:
+    elif len(args) == 2:
         # Two arguments: year and month (use .env for URL)
         ics_url = env_vars.get('ICS_URL')
         if not ics_url:
@@ -457,19 +765,19 @@ def main():
             print("Please create a .env file with your ICS_URL or provide the URL as first argument")
             sys.exit(1)
         
-        target_year = int(sys.argv[1])
-        target_month = int(sys.argv[2])
+        target_year = int(args[0])
+        target_month = int(args[1])
         
         print(f"URL: {ics_url}")
         print(f"Target: {target_year}-{target_month:02d}")
         
         total_events = archive_month(ics_url, target_year, target_month)
         
-    elif len(sys.argv) == 4:
+    elif len(args) == 3:
         # Three arguments: URL, year, month (original behavior)
-        ics_url = sys.argv[1]
-        target_year = int(sys.argv[2])
-        target_month = int(sys.argv[3])
+        ics_url = args[0]
+        target_year = int(args[1])
+        target_month = int(args[2])
         
         print(f"URL: {ics_url}")
         print(f"Target: {target_year}-{target_month:02d}")
@@ -482,6 +790,9 @@ def main():
         print("  python calendar_archiver.py <year> <month>     # Archive specific month using .env URL")
         print("  python calendar_archiver.py <url> <year> <month>  # Archive specific month with URL")
         print("")
+        print("Options:")
+        print("  -v, --verbose    Also list unchanged events (or set LOG_LEVEL=DEBUG)")
+        print("")
         print("Examples:")
         print("  python calendar_archiver.py                    # Archive all months from .env")
         print("  python calendar_archiver.py 2025 08            # Archive Aug 2025 using .env URL")